@@ -1,56 +1,145 @@
-import sys
 import subprocess
 import threading
 import time
 import os
 import json
-import streamlit.components.v1 as components
-from datetime import datetime, timedelta
+import csv
+import io
+import hashlib
+import shutil
+import asyncio
+import concurrent.futures
+import queue
+import signal
+import logging
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
 import urllib.parse
 import requests
 import sqlite3
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Install required packages
-try:
-    import streamlit as st
-except ImportError:
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "streamlit"])
-    import streamlit as st
+# Dependencies come from requirements.txt; fail fast instead of installing at import
+import streamlit as st
+import google.auth
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request as GoogleAuthRequest
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from google_auth_oauthlib.flow import Flow
+
+logger = logging.getLogger(__name__)
 
+# Optional faster JSON backend
 try:
-    import google.auth
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google_auth_oauthlib.flow import Flow
+    import orjson
 except ImportError:
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "google-auth", "google-auth-oauthlib", "google-api-python-client"])
-    import google.auth
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google_auth_oauthlib.flow import Flow
+    orjson = None
 
-# Initialize database for persistent logs
-def init_database():
-    """Initialize SQLite database for persistent logs"""
-    try:
-        db_path = Path("streaming_logs.db")
-        conn = sqlite3.connect(db_path)
+def json_loads(data):
+    """Parse JSON from str or bytes, with orjson when available"""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(obj, sort_keys=False):
+    """Serialize to a compact JSON string, with orjson when available"""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0).decode()
+    return json.dumps(obj, sort_keys=sort_keys, separators=(',', ':'))
+
+@st.cache_resource(show_spinner=False)
+def http_session():
+    """Process-wide HTTP session so OAuth token requests reuse keep-alive connections"""
+    # Cached rather than a module global, which Streamlit rebuilds on every rerun
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    ))
+    return session
+
+DB_PATH = "streaming_logs.db"
+
+def connect_db(check_same_thread=True):
+    """Open a logs database connection with per-connection PRAGMAs applied"""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=check_same_thread)
+    # WAL makes NORMAL durable enough: commits no longer fsync, checkpoints do
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-64000")
+    return conn
+
+@st.cache_resource(show_spinner=False)
+def db_write_lock():
+    """Process-wide lock serializing every use of the shared connection"""
+    # Writes run as `with db_write_lock(), conn:` so they commit on success
+    # and roll back on error; reads hold it while executing and fetching
+    return threading.Lock()
+
+@st.cache_resource(show_spinner=False)
+def get_db():
+    """Shared logs database connection, opened once per process"""
+    # Every rerun and fragment tick runs on a new script thread, so the connection
+    # is shared across threads and guarded by db_write_lock() instead
+    return connect_db(check_same_thread=False)
+
+LOGS_TABLE_COLUMNS = '''(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp INTEGER NOT NULL,
+    session_id TEXT NOT NULL,
+    log_type TEXT NOT NULL,
+    message TEXT NOT NULL,
+    video_file TEXT,
+    stream_key TEXT,
+    channel_name TEXT
+)'''
+
+@st.cache_resource(show_spinner=False)
+def _create_schema():
+    """Create and migrate the database schema; runs once per process. Returns whether FTS5 tag search is available"""
+    conn = get_db()
+    with db_write_lock(), conn:
         cursor = conn.cursor()
         
-        # Create logs table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS streaming_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                session_id TEXT NOT NULL,
-                log_type TEXT NOT NULL,
-                message TEXT NOT NULL,
-                video_file TEXT,
-                stream_key TEXT,
-                channel_name TEXT
-            )
-        ''')
+        # Journal mode is stored in the database file, so setting it once covers every connection
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
+        # Create logs table; timestamp is Unix epoch microseconds
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS streaming_logs {LOGS_TABLE_COLUMNS}")
+        
+        # Version 1: ISO-text timestamps (local time) become INTEGER epoch microseconds
+        if cursor.execute("PRAGMA user_version").fetchone()[0] < 1:
+            cursor.execute("DROP TABLE IF EXISTS streaming_logs_v1")
+            cursor.execute(f"CREATE TABLE streaming_logs_v1 {LOGS_TABLE_COLUMNS}")
+            cursor.execute('''
+                INSERT INTO streaming_logs_v1
+                SELECT id, CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000000) AS INTEGER),
+                       session_id, log_type, message, video_file, stream_key, channel_name
+                FROM streaming_logs
+            ''')
+            cursor.execute("DROP TABLE streaming_logs")
+            cursor.execute("ALTER TABLE streaming_logs_v1 RENAME TO streaming_logs")
+            cursor.execute("PRAGMA user_version = 1")
+        
+        # Version 3: the log indexes were declared timestamp DESC, which keeps rowids ascending
+        # within a timestamp and forces a sort for the id DESC tie-breaker; rebuild them ascending
+        if cursor.execute("PRAGMA user_version").fetchone()[0] < 3:
+            cursor.execute("DROP INDEX IF EXISTS idx_logs_session_ts")
+            cursor.execute("DROP INDEX IF EXISTS idx_logs_ts")
+            cursor.execute("DROP INDEX IF EXISTS idx_logs_type_ts")
+            cursor.execute("PRAGMA user_version = 3")
+        
+        # Scanned backwards, these serve ORDER BY timestamp DESC, id DESC (per session,
+        # per type and overall) without a sort
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_session_ts ON streaming_logs(session_id, timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts ON streaming_logs(timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_type_ts ON streaming_logs(log_type, timestamp)")
         
         # Create streaming_sessions table
         cursor.execute('''
@@ -71,6 +160,39 @@ def init_database():
             )
         ''')
         
+        # Full-text index over session tags, kept in sync by triggers (introduced as version 2).
+        # Keyed on the table's presence rather than user_version, since it is skipped
+        # (and retried on the next start) when SQLite lacks FTS5.
+        fts_available = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'streaming_sessions_fts'"
+        ).fetchone() is not None
+        if not fts_available:
+            try:
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS streaming_sessions_fts
+                    USING fts5(tags, content='streaming_sessions', content_rowid='id')
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS streaming_sessions_fts_ai AFTER INSERT ON streaming_sessions BEGIN
+                        INSERT INTO streaming_sessions_fts(rowid, tags) VALUES (new.id, new.tags);
+                    END
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS streaming_sessions_fts_ad AFTER DELETE ON streaming_sessions BEGIN
+                        INSERT INTO streaming_sessions_fts(streaming_sessions_fts, rowid, tags) VALUES ('delete', old.id, old.tags);
+                    END
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS streaming_sessions_fts_au AFTER UPDATE OF tags ON streaming_sessions BEGIN
+                        INSERT INTO streaming_sessions_fts(streaming_sessions_fts, rowid, tags) VALUES ('delete', old.id, old.tags);
+                        INSERT INTO streaming_sessions_fts(rowid, tags) VALUES (new.id, new.tags);
+                    END
+                ''')
+                cursor.execute("INSERT INTO streaming_sessions_fts(streaming_sessions_fts) VALUES ('rebuild')")
+                fts_available = True
+            except sqlite3.OperationalError:
+                pass
+        
         # Create saved_channels table for persistent authentication
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS saved_channels (
@@ -83,40 +205,49 @@ def init_database():
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        return fts_available
+
+# Initialize database for persistent logs
+def init_database():
+    """Initialize SQLite database for persistent logs"""
+    try:
+        _create_schema()
     except Exception as e:
         st.error(f"Database initialization error: {e}")
 
 def save_channel_auth(channel_name, channel_id, auth_data):
     """Save channel authentication data persistently"""
     try:
-        conn = sqlite3.connect("streaming_logs.db")
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO saved_channels 
-            (channel_name, channel_id, auth_data, created_at, last_used)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            channel_name,
-            channel_id,
-            json.dumps(auth_data),
-            datetime.now().isoformat(),
-            datetime.now().isoformat()
-        ))
-        
-        conn.commit()
-        conn.close()
+        conn = get_db()
+        with db_write_lock(), conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO saved_channels 
+                (channel_name, channel_id, auth_data, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(channel_name) DO UPDATE SET
+                    channel_id = excluded.channel_id,
+                    auth_data = excluded.auth_data,
+                    last_used = excluded.last_used
+            ''', (
+                channel_name,
+                channel_id,
+                json_dumps(auth_data),
+                datetime.now().isoformat(),
+                datetime.now().isoformat()
+            ))
+        _read_saved_channels.clear()
         return True
     except Exception as e:
         st.error(f"Error saving channel auth: {e}")
         return False
 
-def load_saved_channels():
-    """Load saved channel authentication data"""
-    try:
-        conn = sqlite3.connect("streaming_logs.db")
+@st.cache_data(show_spinner=False)
+def _read_saved_channels():
+    """Read and decode saved channels; cleared whenever saved_channels changes"""
+    conn = get_db()
+    with db_write_lock():
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -124,19 +255,24 @@ def load_saved_channels():
             FROM saved_channels 
             ORDER BY last_used DESC
         ''')
-        
-        channels = []
-        for row in cursor.fetchall():
-            channel_name, channel_id, auth_data, last_used = row
-            channels.append({
-                'name': channel_name,
-                'id': channel_id,
-                'auth': json.loads(auth_data),
-                'last_used': last_used
-            })
-        
-        conn.close()
-        return channels
+        rows = cursor.fetchall()
+    
+    channels = []
+    for row in rows:
+        channel_name, channel_id, auth_data, last_used = row
+        channels.append({
+            'name': channel_name,
+            'id': channel_id,
+            'auth': json_loads(auth_data),
+            'last_used': last_used
+        })
+    
+    return channels
+
+def load_saved_channels():
+    """Load saved channel authentication data"""
+    try:
+        return _read_saved_channels()
     except Exception as e:
         st.error(f"Error loading saved channels: {e}")
         return []
@@ -144,70 +280,109 @@ def load_saved_channels():
 def update_channel_last_used(channel_name):
     """Update last used timestamp for a channel"""
     try:
-        conn = sqlite3.connect("streaming_logs.db")
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE saved_channels 
-            SET last_used = ?
-            WHERE channel_name = ?
-        ''', (datetime.now().isoformat(), channel_name))
-        
-        conn.commit()
-        conn.close()
+        conn = get_db()
+        with db_write_lock(), conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE saved_channels 
+                SET last_used = ?
+                WHERE channel_name = ?
+            ''', (datetime.now().isoformat(), channel_name))
+        _read_saved_channels.clear()
     except Exception as e:
         st.error(f"Error updating channel last used: {e}")
 
+# Log rows are queued and written by one background thread in batched transactions
+LOG_QUEUE_MAX = 10000
+LOG_WRITE_BATCH = 500
+LOG_WRITE_WAIT = 0.1
+
+@st.cache_resource(show_spinner=False)
+def get_log_writer():
+    """Queue of log rows drained into SQLite by a single daemon thread (one per process)"""
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
+    
+    def write_batches():
+        conn = connect_db()
+        while True:
+            batch = [log_queue.get()]
+            # Collect whatever else arrives within a short window, up to the batch size
+            deadline = time.monotonic() + LOG_WRITE_WAIT
+            while len(batch) < LOG_WRITE_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(log_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany('''
+                        INSERT INTO streaming_logs 
+                        (timestamp, session_id, log_type, message, video_file, stream_key, channel_name)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', batch)
+            except sqlite3.Error as e:
+                # No script context on this thread, so report through the server log
+                logger.error("Error logging to database: %s", e)
+    
+    threading.Thread(target=write_batches, name="log-writer", daemon=True).start()
+    return log_queue
+
 def log_to_database(session_id, log_type, message, video_file=None, stream_key=None, channel_name=None):
     """Log message to database"""
-    try:
-        conn = sqlite3.connect("streaming_logs.db")
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO streaming_logs 
-            (timestamp, session_id, log_type, message, video_file, stream_key, channel_name)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            datetime.now().isoformat(),
-            session_id,
-            log_type,
-            message,
-            video_file,
-            stream_key,
-            channel_name
-        ))
-        
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        st.error(f"Error logging to database: {e}")
+    log_batch_to_database(session_id, log_type, [message], video_file, stream_key, channel_name)
+
+def log_batch_to_database(session_id, log_type, messages, video_file=None, stream_key=None, channel_name=None):
+    """Queue several messages of one type for the background log writer"""
+    log_queue = get_log_writer()
+    for index, message in enumerate(messages):
+        # Stamped per row so lines from one batch keep their order when sorted by time
+        timestamp = time.time_ns() // 1000
+        try:
+            log_queue.put_nowait((timestamp, session_id, log_type, message, video_file, stream_key, channel_name))
+        except queue.Full:
+            # Never block: callers include the shared event loop that drains every stream's FFmpeg output.
+            # FFmpeg progress lines are expendable; anything else is reported as dropped.
+            if log_type != "FFMPEG":
+                logger.warning("Log queue full; dropped %d %s row(s) for session %s",
+                               len(messages) - index, log_type, session_id)
+            break
 
-def get_logs_from_database(session_id=None, limit=100):
+@st.cache_data(ttl=2, show_spinner=False)
+def _read_logs(session_id, limit, log_type):
+    """Query the newest logs; shared by reruns within a couple of seconds"""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    conditions, params = [], []
+    if session_id:
+        conditions.append("session_id = ?")
+        params.append(session_id)
+    if log_type:
+        conditions.append("log_type = ?")
+        params.append(log_type)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    with db_write_lock():
+        cursor.execute(f'''
+            SELECT timestamp, log_type, message, video_file, channel_name
+            FROM streaming_logs 
+            {where}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        ''', (*params, limit))
+        rows = cursor.fetchall()
+    
+    # Stored as epoch microseconds; shown as local ISO time
+    return [(datetime.fromtimestamp(ts / 1_000_000).isoformat(), *rest) for ts, *rest in rows]
+
+def get_logs_from_database(session_id=None, limit=100, log_type=None):
     """Get logs from database"""
     try:
-        conn = sqlite3.connect("streaming_logs.db")
-        cursor = conn.cursor()
-        
-        if session_id:
-            cursor.execute('''
-                SELECT timestamp, log_type, message, video_file, channel_name
-                FROM streaming_logs 
-                WHERE session_id = ?
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (session_id, limit))
-        else:
-            cursor.execute('''
-                SELECT timestamp, log_type, message, video_file, channel_name
-                FROM streaming_logs 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (limit,))
-        
-        logs = cursor.fetchall()
-        conn.close()
-        return logs
+        return _read_logs(session_id, limit, log_type)
     except Exception as e:
         st.error(f"Error getting logs from database: {e}")
         return []
@@ -215,35 +390,75 @@ def get_logs_from_database(session_id=None, limit=100):
 def save_streaming_session(session_id, video_file, stream_title, stream_description, tags, category, privacy_status, made_for_kids, channel_name):
     """Save streaming session to database"""
     try:
-        conn = sqlite3.connect("streaming_logs.db")
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO streaming_sessions 
-            (session_id, start_time, video_file, stream_title, stream_description, tags, category, privacy_status, made_for_kids, channel_name)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            session_id,
-            datetime.now().isoformat(),
-            video_file,
-            stream_title,
-            stream_description,
-            tags,
-            category,
-            privacy_status,
-            made_for_kids,
-            channel_name
-        ))
-        
-        conn.commit()
-        conn.close()
+        conn = get_db()
+        with db_write_lock(), conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO streaming_sessions 
+                (session_id, start_time, video_file, stream_title, stream_description, tags, category, privacy_status, made_for_kids, channel_name)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    start_time = excluded.start_time,
+                    video_file = excluded.video_file,
+                    stream_title = excluded.stream_title,
+                    stream_description = excluded.stream_description,
+                    tags = excluded.tags,
+                    category = excluded.category,
+                    privacy_status = excluded.privacy_status,
+                    made_for_kids = excluded.made_for_kids,
+                    channel_name = excluded.channel_name
+            ''', (
+                session_id,
+                datetime.now().isoformat(),
+                video_file,
+                stream_title,
+                stream_description,
+                tags,
+                category,
+                privacy_status,
+                made_for_kids,
+                channel_name
+            ))
     except Exception as e:
         st.error(f"Error saving streaming session: {e}")
 
+def search_sessions_by_tag(query, limit=20):
+    """Find past streaming sessions whose tags match the query"""
+    try:
+        fts_available = _create_schema()
+        cursor = get_db().cursor()
+        with db_write_lock():
+            if fts_available:
+                # Quoted as a single FTS5 phrase so user input cannot break the MATCH syntax
+                phrase = '"' + query.replace('"', '""') + '"'
+                cursor.execute('''
+                    SELECT s.session_id, s.start_time, s.stream_title, s.tags, s.channel_name
+                    FROM streaming_sessions_fts f
+                    JOIN streaming_sessions s ON s.id = f.rowid
+                    WHERE streaming_sessions_fts MATCH ?
+                    ORDER BY f.rank
+                    LIMIT ?
+                ''', (phrase, limit))
+            else:
+                # SQLite built without FTS5: fall back to a substring scan
+                pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                cursor.execute('''
+                    SELECT session_id, start_time, stream_title, tags, channel_name
+                    FROM streaming_sessions
+                    WHERE tags LIKE ? ESCAPE '\\'
+                    ORDER BY start_time DESC
+                    LIMIT ?
+                ''', (pattern, limit))
+            return cursor.fetchall()
+    except Exception as e:
+        st.error(f"Error searching sessions: {e}")
+        return []
+
 def load_google_oauth_config(json_file):
     """Load Google OAuth configuration from downloaded JSON file"""
     try:
-        config = json.load(json_file)
+        config = json_loads(json_file.read())
         if 'web' in config:
             return config['web']
         elif 'installed' in config:
@@ -255,22 +470,26 @@ def load_google_oauth_config(json_file):
         st.error(f"Error loading Google OAuth JSON: {e}")
         return None
 
+def _build_auth_url(auth_uri, client_id, redirect_uri):
+    """Build the OAuth consent URL for a client and redirect URI"""
+    params = {
+        'client_id': client_id,
+        'redirect_uri': redirect_uri,
+        'scope': 'https://www.googleapis.com/auth/youtube.force-ssl',
+        'response_type': 'code',
+        'access_type': 'offline',
+        'prompt': 'consent'
+    }
+    return f"{auth_uri}?{urllib.parse.urlencode(params, quote_via=urllib.parse.quote)}"
+
 def generate_auth_url(client_config):
     """Generate OAuth authorization URL"""
     try:
-        scopes = ['https://www.googleapis.com/auth/youtube.force-ssl']
-        
-        # Create authorization URL
-        auth_url = (
-            f"{client_config['auth_uri']}?"
-            f"client_id={client_config['client_id']}&"
-            f"redirect_uri={urllib.parse.quote(client_config['redirect_uris'][0])}&"
-            f"scope={urllib.parse.quote(' '.join(scopes))}&"
-            f"response_type=code&"
-            f"access_type=offline&"
-            f"prompt=consent"
+        return _build_auth_url(
+            client_config['auth_uri'],
+            client_config['client_id'],
+            client_config['redirect_uris'][0]
         )
-        return auth_url
     except Exception as e:
         st.error(f"Error generating auth URL: {e}")
         return None
@@ -286,10 +505,12 @@ def exchange_code_for_tokens(client_config, auth_code):
             'redirect_uri': client_config['redirect_uris'][0]
         }
         
-        response = requests.post(client_config['token_uri'], data=token_data)
+        response = http_session().post(client_config['token_uri'], data=token_data, timeout=(3.05, 10))
         
         if response.status_code == 200:
             tokens = response.json()
+            # Absolute expiry in naive UTC, as google-auth expects, so refreshes happen ahead of time
+            tokens['expiry'] = (datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=tokens.get('expires_in', 3600))).isoformat()
             return tokens
         else:
             st.error(f"Token exchange failed: {response.text}")
@@ -301,16 +522,22 @@ def exchange_code_for_tokens(client_config, auth_code):
 def load_channel_config(json_file):
     """Load channel configuration from JSON file"""
     try:
-        config = json.load(json_file)
+        config = json_loads(json_file.read())
         return config
     except Exception as e:
         st.error(f"Error loading JSON file: {e}")
         return None
 
+# Channel config schema: top-level keys and keys every channel entry needs
+CONFIG_REQUIRED_FIELDS = ('channels',)
+CHANNEL_REQUIRED_FIELDS = ('name', 'stream_key')
+
 def validate_channel_config(config):
     """Validate channel configuration structure"""
-    required_fields = ['channels']
-    for field in required_fields:
+    if not isinstance(config, dict):
+        return False, "Configuration must be a JSON object"
+    
+    for field in CONFIG_REQUIRED_FIELDS:
         if field not in config:
             return False, f"Missing required field: {field}"
     
@@ -318,32 +545,59 @@ def validate_channel_config(config):
         return False, "Channels must be a list"
     
     for i, channel in enumerate(config['channels']):
-        required_channel_fields = ['name', 'stream_key']
-        for field in required_channel_fields:
+        if not isinstance(channel, dict):
+            return False, f"Channel {i+1} must be an object"
+        for field in CHANNEL_REQUIRED_FIELDS:
             if field not in channel:
                 return False, f"Channel {i+1} missing required field: {field}"
     
     return True, "Valid configuration"
 
+# Retries for read-only YouTube API calls; googleapiclient backs off exponentially with jitter on 429/5xx.
+# Inserts and binds are not idempotent, so a retried timeout could create duplicates; they run once.
+API_NUM_RETRIES = 4
+
+def credentials_fingerprint(credentials_dict):
+    """Stable fingerprint identifying a set of credentials"""
+    return hashlib.sha1(json_dumps(credentials_dict, sort_keys=True).encode()).hexdigest()
+
+def _build_youtube_service(credentials_dict):
+    """Build a YouTube API service from a credentials dict"""
+    if 'token' in credentials_dict:
+        credentials = Credentials.from_authorized_user_info(credentials_dict)
+    else:
+        credentials = Credentials(
+            token=credentials_dict.get('access_token'),
+            refresh_token=credentials_dict.get('refresh_token'),
+            token_uri=credentials_dict.get('token_uri', 'https://oauth2.googleapis.com/token'),
+            client_id=credentials_dict.get('client_id'),
+            client_secret=credentials_dict.get('client_secret'),
+            scopes=['https://www.googleapis.com/auth/youtube.force-ssl'],
+            expiry=datetime.fromisoformat(credentials_dict['expiry']) if credentials_dict.get('expiry') else None
+        )
+    
+    # Refresh over the pooled session up front instead of on the first API call
+    if not credentials.valid and credentials.refresh_token:
+        credentials.refresh(GoogleAuthRequest(session=http_session()))
+    
+    # Use the discovery document bundled with googleapiclient instead of fetching it
+    return build('youtube', 'v3', credentials=credentials, cache_discovery=False, static_discovery=True)
+
 def create_youtube_service(credentials_dict):
     """Create YouTube API service from credentials"""
+    # Kept per session: the service's httplib2.Http is not thread-safe, so it
+    # must not be shared across sessions the way st.cache_resource would
+    fingerprint = credentials_fingerprint(credentials_dict)
+    cached = st.session_state.get('youtube_service_cache')
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
     try:
-        if 'token' in credentials_dict:
-            credentials = Credentials.from_authorized_user_info(credentials_dict)
-        else:
-            credentials = Credentials(
-                token=credentials_dict.get('access_token'),
-                refresh_token=credentials_dict.get('refresh_token'),
-                token_uri=credentials_dict.get('token_uri', 'https://oauth2.googleapis.com/token'),
-                client_id=credentials_dict.get('client_id'),
-                client_secret=credentials_dict.get('client_secret'),
-                scopes=['https://www.googleapis.com/auth/youtube.force-ssl']
-            )
-        service = build('youtube', 'v3', credentials=credentials)
-        return service
+        service = _build_youtube_service(credentials_dict)
     except Exception as e:
         st.error(f"Error creating YouTube service: {e}")
         return None
+    st.session_state['youtube_service_cache'] = (fingerprint, service)
+    return service
 
 def get_stream_key_only(service):
     """Get stream key without creating broadcast"""
@@ -373,22 +627,61 @@ def get_stream_key_only(service):
         st.error(f"Error getting stream key: {e}")
         return None
 
-def get_channel_info(service, channel_id=None):
+# Oldest entries are evicted beyond this; keys change with every token refresh
+CHANNEL_ETAGS_MAX = 16
+
+def channel_etags():
+    """Last channels.list response per (credentials, channel) for ETag revalidation"""
+    # Per session, so entries die with it; module globals are rebuilt on every rerun
+    return st.session_state.setdefault('channel_etags', {})
+
+def _request_channel_info(service, credentials_key, channel_id):
+    """Fetch channel information, revalidating with the last seen ETag"""
+    if channel_id:
+        request = service.channels().list(
+            part="snippet,statistics",
+            id=channel_id
+        )
+    else:
+        request = service.channels().list(
+            part="snippet,statistics",
+            mine=True
+        )
+    
+    etags = channel_etags()
+    etag_key = (credentials_key, channel_id)
+    cached = etags.get(etag_key) if credentials_key else None
+    if cached:
+        request.headers['If-None-Match'] = cached[0]
+    
+    try:
+        response = request.execute(num_retries=API_NUM_RETRIES)
+    except HttpError as e:
+        # 304 Not Modified: the previous items are still current
+        if cached and e.resp.status == 304:
+            return cached[1]
+        raise
+    
+    items = response.get('items', [])
+    if credentials_key and response.get('etag'):
+        etags.pop(etag_key, None)
+        if len(etags) >= CHANNEL_ETAGS_MAX:
+            # Dicts keep insertion order, so the first key is the least recently stored
+            del etags[next(iter(etags))]
+        etags[etag_key] = (response['etag'], items)
+    return items
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_channel_info(_service, credentials_key, channel_id):
+    """Channel information memoized per credentials for a few minutes"""
+    return _request_channel_info(_service, credentials_key, channel_id)
+
+def get_channel_info(service, channel_id=None, credentials_key=None):
     """Get channel information from YouTube API"""
     try:
-        if channel_id:
-            request = service.channels().list(
-                part="snippet,statistics",
-                id=channel_id
-            )
-        else:
-            request = service.channels().list(
-                part="snippet,statistics",
-                mine=True
-            )
-        
-        response = request.execute()
-        return response.get('items', [])
+        if credentials_key:
+            return _cached_channel_info(service, credentials_key, channel_id)
+        return _request_channel_info(service, None, channel_id)
     except Exception as e:
         st.error(f"Error fetching channel info: {e}")
         return []
@@ -396,7 +689,7 @@ def get_channel_info(service, channel_id=None):
 def create_live_stream(service, title, description, scheduled_start_time, tags=None, category_id="20", privacy_status="public", made_for_kids=False):
     """Create a live stream on YouTube with complete settings"""
     try:
-        # Create live stream
+        # Live stream request
         stream_request = service.liveStreams().insert(
             part="snippet,cdn",
             body={
@@ -411,7 +704,6 @@ def create_live_stream(service, title, description, scheduled_start_time, tags=N
                 }
             }
         )
-        stream_response = stream_request.execute()
         
         # Prepare broadcast body
         broadcast_body = {
@@ -438,14 +730,30 @@ def create_live_stream(service, title, description, scheduled_start_time, tags=N
         if category_id:
             broadcast_body["snippet"]["categoryId"] = category_id
         
-        # Create live broadcast
+        # Live broadcast request
         broadcast_request = service.liveBroadcasts().insert(
             part="snippet,status,contentDetails",
             body=broadcast_body
         )
-        broadcast_response = broadcast_request.execute()
         
-        # Bind stream to broadcast
+        # Both inserts are independent, so send them in one batched round-trip
+        responses = {}
+        
+        def collect_response(request_id, response, exception):
+            responses[request_id] = exception if exception is not None else response
+        
+        batch = service.new_batch_http_request(callback=collect_response)
+        batch.add(stream_request, request_id="stream")
+        batch.add(broadcast_request, request_id="broadcast")
+        batch.execute()
+        
+        for result in responses.values():
+            if isinstance(result, Exception):
+                raise result
+        stream_response = responses['stream']
+        broadcast_response = responses['broadcast']
+        
+        # Bind stream to broadcast; needs both IDs so it stays a separate call
         bind_request = service.liveBroadcasts().bind(
             part="id,contentDetails",
             id=broadcast_response['id'],
@@ -475,7 +783,7 @@ def get_existing_broadcasts(service, max_results=10):
             maxResults=max_results,
             broadcastStatus="all"
         )
-        response = request.execute()
+        response = request.execute(num_retries=API_NUM_RETRIES)
         return response.get('items', [])
     except Exception as e:
         st.error(f"Error getting existing broadcasts: {e}")
@@ -489,7 +797,7 @@ def get_broadcast_stream_key(service, broadcast_id):
             part="contentDetails",
             id=broadcast_id
         )
-        broadcast_response = broadcast_request.execute()
+        broadcast_response = broadcast_request.execute(num_retries=API_NUM_RETRIES)
         
         if not broadcast_response['items']:
             return None
@@ -504,7 +812,7 @@ def get_broadcast_stream_key(service, broadcast_id):
             part="cdn",
             id=stream_id
         )
-        stream_response = stream_request.execute()
+        stream_response = stream_request.execute(num_retries=API_NUM_RETRIES)
         
         if stream_response['items']:
             stream_info = stream_response['items'][0]['cdn']['ingestionInfo']
@@ -519,34 +827,274 @@ def get_broadcast_stream_key(service, broadcast_id):
         st.error(f"Error getting broadcast stream key: {e}")
         return None
 
-def run_ffmpeg(video_path, stream_key, is_shorts, log_callback, rtmp_url=None, session_id=None):
-    """Run FFmpeg for streaming with enhanced logging"""
-    output_url = rtmp_url or f"rtmp://a.rtmp.youtube.com/live2/{stream_key}"
-    scale = "-vf scale=720:1280" if is_shorts else ""
-    cmd = [
-        "ffmpeg", "-re", "-stream_loop", "-1", "-i", video_path,
-        "-c:v", "libx264", "-preset", "veryfast", "-b:v", "2500k",
-        "-maxrate", "2500k", "-bufsize", "5000k",
+# Hardware H.264 encoders in order of preference; libx264 is the software fallback
+HW_ENCODERS = ("h264_nvenc", "h264_qsv", "h264_vaapi", "h264_videotoolbox")
+VAAPI_DEVICE = "/dev/dri/renderD128"
+
+@st.cache_resource(show_spinner=False)
+def detect_hw_encoder():
+    """Probe FFmpeg once per process for a working hardware H.264 encoder"""
+    try:
+        listing = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            capture_output=True, text=True, timeout=10
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return "libx264"
+    
+    for encoder in HW_ENCODERS:
+        if encoder not in listing:
+            continue
+        # A listed encoder may still lack a device or driver, so encode a few test frames
+        input_args, video_args = video_encoder_args(encoder, False)
+        test_cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", *input_args,
+            "-f", "lavfi", "-i", "testsrc=size=320x240:rate=30:duration=0.2",
+            *video_args, "-f", "null", "-"
+        ]
+        try:
+            if subprocess.run(test_cmd, capture_output=True, timeout=15).returncode == 0:
+                return encoder
+        except (OSError, subprocess.SubprocessError):
+            continue
+    return "libx264"
+
+def video_encoder_args(encoder, is_shorts):
+    """Return (input args, video encoding args) for an H.264 encoder"""
+    rate_args = [
+        "-b:v", "2500k", "-maxrate", "2500k", "-bufsize", "5000k",
+        "-g", "60", "-keyint_min", "60"
+    ]
+    scale = ["scale=720:1280"] if is_shorts else []
+    
+    if encoder == "h264_vaapi":
+        # Frames are uploaded to the GPU surface after any software scaling
+        vf = ",".join(scale + ["format=nv12", "hwupload"])
+        return ["-vaapi_device", VAAPI_DEVICE], ["-vf", vf, "-c:v", "h264_vaapi"] + rate_args
+    
+    filter_args = ["-vf", scale[0]] if scale else []
+    input_args = []
+    if encoder == "h264_nvenc":
+        # Decode on the GPU too; frames come back to system memory so the CPU scale
+        # filter and a software-decode fallback keep working
+        input_args = ["-hwaccel", "cuda"]
+        codec_args = ["-c:v", "h264_nvenc", "-preset", "p4", "-tune", "ll", "-rc", "cbr"]
+    elif encoder in ("h264_qsv", "h264_videotoolbox"):
+        codec_args = ["-c:v", encoder]
+    else:
+        # zerolatency drops lookahead and B-frames: less work per frame, lower ingest delay
+        codec_args = [
+            "-c:v", "libx264", "-preset", "veryfast", "-tune", "zerolatency", "-threads", "0",
+            "-x264-params", "nal-hrd=cbr:force-cfr=1"
+        ]
+    return input_args, filter_args + codec_args + rate_args
+
+# Live log lines kept in memory per session
+MAX_LIVE_LOGS = 50
+# Per-line and whole-panel caps on what the live log panel sends to the browser
+MAX_LOG_LINE_CHARS = 512
+MAX_LOG_PANEL_BYTES = 16 * 1024
+# Seconds between live log panel refreshes while streaming. Fixed on purpose: a
+# fragment's run_every can only change through a full-app rerun, so an idle backoff
+# would cost more reruns than it saves
+LOG_POLL_INTERVAL = 2
+
+# Warnings only, plus one progress line every 5s (-stats keeps progress below info level)
+FFMPEG_QUIET_ARGS = ("ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "warning", "-stats", "-stats_period", "5")
+
+# FFmpeg output handling: read size, lines kept between flushes, flush interval (s)
+FFMPEG_READ_SIZE = 64 * 1024
+FFMPEG_PENDING_LINES = 500
+FFMPEG_FLUSH_INTERVAL = 0.1
+# Progress lines ("frame=... fps=...") are only worth persisting now and then
+FFMPEG_PROGRESS_PREFIXES = ("frame=", "size=")
+FFMPEG_PROGRESS_PERSIST_INTERVAL = 30
+
+# Live-ready transcodes, keyed by source content hash and orientation
+NORMALIZE_CACHE_DIR = Path(".norm_cache")
+# Least recently used pre-encodes are evicted beyond this total size
+NORMALIZE_CACHE_MAX_BYTES = 10 * 1024 ** 3
+# Partial encodes untouched for this long were abandoned by a crashed or killed server
+NORMALIZE_PARTIAL_MAX_AGE = 60 * 60
+
+@st.cache_resource(show_spinner=False)
+def get_event_loop():
+    """Background event loop that drives every FFmpeg process in this server"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="ffmpeg-event-loop", daemon=True).start()
+    return loop
+
+async def spawn_ffmpeg(cmd, process_callback=None):
+    """Start FFmpeg with combined output in its own process group"""
+    # Own process group so stopping signals only this FFmpeg
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        start_new_session=True
+    )
+    if process_callback:
+        process_callback(process)
+    return process
+
+async def drain_ffmpeg_output(process, log_callback, session_id=None, video_path=None):
+    """Forward FFmpeg output lines to the log callback until the process exits"""
+    # Ring buffer of decoded lines waiting for the next throttled flush
+    pending = deque(maxlen=FFMPEG_PENDING_LINES)
+    tail = bytearray()
+    last_flush = time.monotonic()
+    last_progress_saved = 0.0
+    eof = False
+    
+    while not eof:
+        try:
+            chunk = await asyncio.wait_for(process.stdout.read(FFMPEG_READ_SIZE), timeout=0.5)
+        except asyncio.TimeoutError:
+            chunk = None
+        
+        if chunk is not None:
+            if chunk:
+                tail += chunk
+            else:
+                eof = True
+            
+            # FFmpeg ends progress lines with \r, everything else with \n
+            end = len(tail) if eof else max(tail.rfind(b'\n'), tail.rfind(b'\r')) + 1
+            if end:
+                for raw in tail[:end].replace(b'\r', b'\n').split(b'\n'):
+                    line = raw.decode('utf-8', errors='replace').strip()
+                    if line:
+                        pending.append(line)
+                del tail[:end]
+        
+        now = time.monotonic()
+        if pending and (eof or now - last_flush >= FFMPEG_FLUSH_INTERVAL):
+            for line in pending:
+                log_callback(line)
+            if session_id:
+                # Keep every warning/error line but only the latest progress line per interval
+                persist = [line for line in pending if not line.startswith(FFMPEG_PROGRESS_PREFIXES)]
+                progress = [line for line in pending if line.startswith(FFMPEG_PROGRESS_PREFIXES)]
+                if progress and now - last_progress_saved >= FFMPEG_PROGRESS_PERSIST_INTERVAL:
+                    persist.append(progress[-1])
+                    last_progress_saved = now
+                if persist:
+                    log_batch_to_database(session_id, "FFMPEG", persist, video_path)
+            pending.clear()
+            last_flush = now
+    
+    return await process.wait()
+
+def file_sha1(path):
+    """SHA-1 hex digest of a file without loading it into memory"""
+    with open(path, 'rb') as fh:
+        if hasattr(hashlib, 'file_digest'):
+            # Python 3.11+: hashed in C with the GIL released
+            return hashlib.file_digest(fh, 'sha1').hexdigest()
+        digest = hashlib.sha1()
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+async def normalize_for_live(video_path, is_shorts, log_callback, session_id=None, process_callback=None):
+    """Transcode a video once into a CBR MPEG-TS that can be streamed with -c copy"""
+    orientation = "shorts" if is_shorts else "landscape"
+    # Hash off the event loop so other streams keep flowing
+    digest = await asyncio.to_thread(file_sha1, video_path)
+    output_path = NORMALIZE_CACHE_DIR / f"{digest}_{orientation}.ts"
+    if output_path.exists():
+        output_path.touch()
+        log_callback(f"♻️ Using pre-encoded source: {output_path.name}")
+        return output_path
+    
+    NORMALIZE_CACHE_DIR.mkdir(exist_ok=True)
+    # Unique per run so concurrent pre-encodes of the same video never share a file
+    partial_path = output_path.with_name(f"{output_path.stem}.{os.getpid()}-{uuid.uuid4().hex[:8]}.part.ts")
+    cmd = [*FFMPEG_QUIET_ARGS, "-y", "-i", video_path]
+    if is_shorts:
+        cmd += ["-vf", "scale=720:1280"]
+    cmd += [
+        "-c:v", "libx264", "-preset", "veryfast",
+        "-b:v", "2500k", "-maxrate", "2500k", "-minrate", "2500k", "-bufsize", "5000k",
         "-g", "60", "-keyint_min", "60",
+        "-x264-params", "nal-hrd=cbr:force-cfr=1",
         "-c:a", "aac", "-b:a", "128k",
-        "-f", "flv"
+        "-f", "mpegts", str(partial_path)
     ]
-    if scale:
-        cmd += scale.split()
-    cmd.append(output_url)
     
-    start_msg = f"🚀 Starting FFmpeg: {' '.join(cmd[:8])}... [RTMP URL hidden for security]"
+    start_msg = "🛠️ Pre-encoding video for live streaming (one time per video)..."
     log_callback(start_msg)
     if session_id:
         log_to_database(session_id, "INFO", start_msg, video_path)
     
     try:
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        for line in process.stdout:
-            log_callback(line.strip())
-            if session_id:
-                log_to_database(session_id, "FFMPEG", line.strip(), video_path)
-        process.wait()
+        process = await spawn_ffmpeg(cmd, process_callback)
+        if await drain_ffmpeg_output(process, log_callback, session_id, video_path) != 0:
+            raise RuntimeError(f"pre-encoding failed with exit code {process.returncode}")
+        partial_path.replace(output_path)
+    except BaseException:
+        # Includes CancelledError from Stop, so an aborted encode never leaves its partial file behind
+        partial_path.unlink(missing_ok=True)
+        raise
+    
+    prune_normalize_cache(keep=output_path)
+    return output_path
+
+def prune_normalize_cache(keep):
+    """Evict least recently used pre-encodes once the cache exceeds its size cap"""
+    entries = []
+    now = time.time()
+    for path in NORMALIZE_CACHE_DIR.glob("*.ts"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.name.endswith(".part.ts"):
+            # In-progress encodes keep writing, so only stale partials are removed
+            if now - stat.st_mtime > NORMALIZE_PARTIAL_MAX_AGE:
+                path.unlink(missing_ok=True)
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    
+    total = 0
+    for _, size, path in sorted(entries, key=lambda entry: entry[0], reverse=True):
+        total += size
+        if total > NORMALIZE_CACHE_MAX_BYTES and path != keep:
+            path.unlink(missing_ok=True)
+
+def ffmpeg_stream_args(encoder, is_shorts, stream_copy):
+    """Static FFmpeg argv before the input path and between it and the output URL"""
+    if stream_copy:
+        return (
+            (*FFMPEG_QUIET_ARGS, "-re", "-stream_loop", "-1", "-fflags", "+genpts", "-i"),
+            ("-c", "copy", "-bsf:a", "aac_adtstoasc", "-f", "flv", "-flvflags", "no_duration_filesize")
+        )
+    input_args, video_args = video_encoder_args(encoder, is_shorts)
+    return (
+        (*FFMPEG_QUIET_ARGS, *input_args, "-re", "-stream_loop", "-1", "-fflags", "+genpts", "-i"),
+        (*video_args, "-c:a", "aac", "-b:a", "128k", "-f", "flv", "-flvflags", "no_duration_filesize")
+    )
+
+async def run_ffmpeg(video_path, stream_key, is_shorts, log_callback, rtmp_url=None, session_id=None, process_callback=None, encoder="libx264", normalize=False):
+    """Run FFmpeg for streaming with enhanced logging"""
+    output_url = rtmp_url or f"rtmp://a.rtmp.youtube.com/live2/{stream_key}"
+    
+    try:
+        if normalize:
+            # Pre-encoded source is already YouTube-ready, so only remux it
+            source_path = str(await normalize_for_live(video_path, is_shorts, log_callback, session_id, process_callback))
+        else:
+            source_path = video_path
+        head_args, tail_args = ffmpeg_stream_args(encoder, is_shorts, normalize)
+        cmd = [*head_args, source_path, *tail_args, output_url]
+        
+        start_msg = f"🚀 Starting FFmpeg: {' '.join(cmd[:-1])} [RTMP URL hidden for security]"
+        log_callback(start_msg)
+        if session_id:
+            log_to_database(session_id, "INFO", start_msg, video_path)
+        
+        process = await spawn_ffmpeg(cmd, process_callback)
+        await drain_ffmpeg_output(process, log_callback, session_id, video_path)
         
         end_msg = "✅ Streaming completed successfully"
         log_callback(end_msg)
@@ -564,6 +1112,26 @@ def run_ffmpeg(video_path, stream_key, is_shorts, log_callback, rtmp_url=None, s
         if session_id:
             log_to_database(session_id, "INFO", final_msg, video_path)
 
+def log_stream_failure(session_id):
+    """Done-callback that records a streaming task that died with an exception"""
+    def callback(future):
+        if not future.cancelled() and future.exception() is not None:
+            log_to_database(session_id, "ERROR", f"❌ Streaming task crashed: {future.exception()!r}")
+    return callback
+
+def stop_ffmpeg(process, timeout=3):
+    """Terminate an FFmpeg process group, killing it if it ignores SIGTERM"""
+    if process is None or process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            asyncio.run_coroutine_threadsafe(process.wait(), get_event_loop()).result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
 def auto_process_auth_code():
     """Automatically process authorization code from URL"""
     # Check URL parameters
@@ -594,13 +1162,14 @@ def auto_process_auth_code():
                             'refresh_token': tokens.get('refresh_token'),
                             'token_uri': oauth_config['token_uri'],
                             'client_id': oauth_config['client_id'],
-                            'client_secret': oauth_config['client_secret']
+                            'client_secret': oauth_config['client_secret'],
+                            'expiry': tokens['expiry']
                         }
                         
                         # Test the connection
                         service = create_youtube_service(creds_dict)
                         if service:
-                            channels = get_channel_info(service)
+                            channels = get_channel_info(service, credentials_key=credentials_fingerprint(creds_dict))
                             if channels:
                                 channel = channels[0]
                                 st.session_state['youtube_service'] = service
@@ -625,24 +1194,61 @@ def auto_process_auth_code():
             else:
                 st.error("❌ OAuth configuration not found. Please upload OAuth JSON first.")
 
+YOUTUBE_CATEGORIES = {
+    "1": "Film & Animation",
+    "2": "Autos & Vehicles", 
+    "10": "Music",
+    "15": "Pets & Animals",
+    "17": "Sports",
+    "19": "Travel & Events",
+    "20": "Gaming",
+    "22": "People & Blogs",
+    "23": "Comedy",
+    "24": "Entertainment",
+    "25": "News & Politics",
+    "26": "Howto & Style",
+    "27": "Education",
+    "28": "Science & Technology"
+}
+
+# Reverse lookup for the category selectbox, which works in names. Like every
+# module-level value here it is rebuilt on each rerun; the dict is tiny
+CATEGORY_IDS_BY_NAME = {name: category_id for category_id, name in YOUTUBE_CATEGORIES.items()}
+
 def get_youtube_categories():
     """Get YouTube video categories"""
-    return {
-        "1": "Film & Animation",
-        "2": "Autos & Vehicles", 
-        "10": "Music",
-        "15": "Pets & Animals",
-        "17": "Sports",
-        "19": "Travel & Events",
-        "20": "Gaming",
-        "22": "People & Blogs",
-        "23": "Comedy",
-        "24": "Entertainment",
-        "25": "News & Politics",
-        "26": "Howto & Style",
-        "27": "Education",
-        "28": "Science & Technology"
-    }
+    return YOUTUBE_CATEGORIES
+
+VIDEO_EXTENSIONS = ('.mp4', '.flv', '.avi', '.mov', '.mkv')
+
+# Only the current mtime is ever looked up, so older listings are evicted at once
+@st.cache_data(max_entries=1, show_spinner=False)
+def list_video_files(dir_mtime_ns):
+    """List video files in the working directory (keyed on its mtime)"""
+    return [entry.name for entry in os.scandir('.') if entry.is_file() and entry.name.lower().endswith(VIDEO_EXTENSIONS)]
+
+def render_live_logs():
+    """Render the tail of the in-memory live log buffer"""
+    live_logs = st.session_state['live_logs']
+    # Single placeholder replaced in place with the log tail
+    log_slot = st.empty()
+    if live_logs:
+        # Rejoin the last 50 lines only when a new line arrived since the last render
+        last_line = live_logs[-1]
+        if st.session_state.get('live_logs_last') is not last_line:
+            st.session_state['live_logs_last'] = last_line
+            # Snapshot first: the event loop thread appends while we iterate.
+            # Keep whole newest lines within the UTF-8 size cap
+            tail, size = [], 0
+            for line in reversed(list(live_logs)):
+                size += len(line.encode('utf-8')) + 1
+                if size > MAX_LOG_PANEL_BYTES:
+                    break
+                tail.append(line)
+            st.session_state['live_logs_text'] = "\n".join(reversed(tail))
+        log_slot.code(st.session_state['live_logs_text'], language=None)
+    else:
+        log_slot.info("No live logs available. Start streaming to see real-time logs.")
 
 def main():
     # Page configuration must be the first Streamlit command
@@ -652,15 +1258,16 @@ def main():
         layout="wide"
     )
     
-    # Initialize database
+    # Initialize database and start the log writer from the script thread
     init_database()
+    get_log_writer()
     
     # Initialize session state
     if 'session_id' not in st.session_state:
         st.session_state['session_id'] = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
     if 'live_logs' not in st.session_state:
-        st.session_state['live_logs'] = []
+        st.session_state['live_logs'] = deque(maxlen=MAX_LIVE_LOGS)
     
     st.title("🎥 Advanced YouTube Live Streaming Platform")
     st.markdown("---")
@@ -693,7 +1300,7 @@ def main():
                         service = create_youtube_service(channel['auth'])
                         if service:
                             # Verify the authentication is still valid
-                            channels = get_channel_info(service)
+                            channels = get_channel_info(service, credentials_key=credentials_fingerprint(channel['auth']))
                             if channels:
                                 channel_info = channels[0]
                                 st.session_state['youtube_service'] = service
@@ -713,13 +1320,20 @@ def main():
         oauth_file = st.file_uploader("Upload Google OAuth JSON", type=['json'], key="oauth_upload")
         
         if oauth_file:
-            oauth_config = load_google_oauth_config(oauth_file)
+            # Parse the upload and build the auth URL only once per uploaded file
+            if st.session_state.get('oauth_file_id') == oauth_file.file_id:
+                oauth_config = st.session_state['oauth_config']
+            else:
+                oauth_config = load_google_oauth_config(oauth_file)
+                if oauth_config:
+                    st.session_state['oauth_file_id'] = oauth_file.file_id
+                    st.session_state['oauth_config'] = oauth_config
+                    st.session_state['auth_url'] = generate_auth_url(oauth_config)
             if oauth_config:
                 st.success("✅ Google OAuth config loaded")
-                st.session_state['oauth_config'] = oauth_config
-                
-                # Generate authorization URL
-                auth_url = generate_auth_url(oauth_config)
+
+                # Authorization URL
+                auth_url = st.session_state.get('auth_url')
                 if auth_url:
                     st.markdown("### Step 1: Authorize Access")
                     st.markdown(f"[🔗 Click here to authorize]({auth_url})")
@@ -749,13 +1363,14 @@ def main():
                                         'refresh_token': tokens.get('refresh_token'),
                                         'token_uri': oauth_config['token_uri'],
                                         'client_id': oauth_config['client_id'],
-                                        'client_secret': oauth_config['client_secret']
+                                        'client_secret': oauth_config['client_secret'],
+                                        'expiry': tokens['expiry']
                                     }
                                     
                                     # Test the connection
                                     service = create_youtube_service(creds_dict)
                                     if service:
-                                        channels = get_channel_info(service)
+                                        channels = get_channel_info(service, credentials_key=credentials_fingerprint(creds_dict))
                                         if channels:
                                             channel = channels[0]
                                             st.success(f"🎉 Connected to: {channel['snippet']['title']}")
@@ -776,39 +1391,50 @@ def main():
         json_file = st.file_uploader("Upload JSON Configuration", type=['json'])
         
         if json_file:
-            config = load_channel_config(json_file)
-            if config:
-                is_valid, message = validate_channel_config(config)
-                if is_valid:
-                    st.success("✅ Valid configuration loaded")
-                    st.session_state['channel_config'] = config
-                else:
-                    st.error(f"❌ Invalid configuration: {message}")
+            # Parse and validate each uploaded file once; later reruns reuse the stored config
+            if st.session_state.get('channel_config_id') == json_file.file_id:
+                st.success("✅ Valid configuration loaded")
+            else:
+                config = load_channel_config(json_file)
+                if config:
+                    is_valid, message = validate_channel_config(config)
+                    if is_valid:
+                        st.success("✅ Valid configuration loaded")
+                        st.session_state['channel_config_id'] = json_file.file_id
+                        st.session_state['channel_config'] = config
+                        st.session_state['channel_count'] = len(config['channels'])
+                        st.session_state['channel_by_name'] = {ch['name']: ch for ch in config['channels']}
+                    else:
+                        st.error(f"❌ Invalid configuration: {message}")
         
         # Log Management
-        st.markdown("---")
-        st.subheader("📊 Log Management")
+        st.markdown("---\n### 📊 Log Management")
         
         col_log1, col_log2 = st.columns(2)
         with col_log1:
             if st.button("🔄 Refresh Logs"):
+                _read_logs.clear()
                 st.rerun()
         
         with col_log2:
             if st.button("🗑️ Clear Session Logs"):
-                st.session_state['live_logs'] = []
+                st.session_state['live_logs'].clear()
                 st.success("Logs cleared!")
         
         # Export logs
         if st.button("📥 Export All Logs"):
             all_logs = get_logs_from_database(limit=1000)
             if all_logs:
-                logs_text = "\n".join([f"[{log[0]}] {log[1]}: {log[2]}" for log in all_logs])
+                # csv.writer formats rows in C and quotes messages containing commas
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(["timestamp", "type", "message"])
+                writer.writerows(log[:3] for log in all_logs)
                 st.download_button(
                     label="💾 Download Logs",
-                    data=logs_text,
-                    file_name=f"streaming_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                    mime="text/plain"
+                    data=buffer.getvalue(),
+                    file_name=f"streaming_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
                 )
     
     # Main content area
@@ -818,7 +1444,8 @@ def main():
         st.header("🎥 Video & Streaming Setup")
         
         # Video selection
-        video_files = [f for f in os.listdir('.') if f.endswith(('.mp4', '.flv', '.avi', '.mov', '.mkv'))]
+        # Only rescanned when the directory changes, not on every rerun
+        video_files = list_video_files(os.stat('.').st_mtime_ns)
         
         if video_files:
             st.write("📁 Available videos:")
@@ -831,11 +1458,14 @@ def main():
         uploaded_file = st.file_uploader("Or upload new video", type=['mp4', 'flv', 'avi', 'mov', 'mkv'])
         
         if uploaded_file:
-            with open(uploaded_file.name, "wb") as f:
-                f.write(uploaded_file.read())
+            # Write each upload to disk once, not again on every rerun
+            if st.session_state.get('video_upload_id') != uploaded_file.file_id:
+                with open(uploaded_file.name, "wb") as f:
+                    shutil.copyfileobj(uploaded_file, f, 1 << 20)
+                st.session_state['video_upload_id'] = uploaded_file.file_id
+                log_to_database(st.session_state['session_id'], "INFO", f"Video uploaded: {uploaded_file.name}")
             st.success("✅ Video uploaded successfully!")
             video_path = uploaded_file.name
-            log_to_database(st.session_state['session_id'], "INFO", f"Video uploaded: {uploaded_file.name}")
         elif selected_video:
             video_path = selected_video
         else:
@@ -891,7 +1521,13 @@ def main():
                     try:
                         service = st.session_state['youtube_service']
                         with st.spinner("Getting stream key..."):
-                            stream_info = get_stream_key_only(service)
+                            # Reuse the liveStream already created for this channel
+                            stream_resources = st.session_state.setdefault('stream_key_resources', {})
+                            stream_info = stream_resources.get(channel['id'])
+                            if not stream_info:
+                                stream_info = get_stream_key_only(service)
+                                if stream_info:
+                                    stream_resources[channel['id']] = stream_info
                             if stream_info:
                                 stream_key = stream_info['stream_key']
                                 st.session_state['current_stream_key'] = stream_key
@@ -1031,12 +1667,11 @@ def main():
         # Channel selection from JSON config
         elif 'channel_config' in st.session_state:
             st.subheader("📺 Channel Selection")
-            config = st.session_state['channel_config']
-            channel_options = [ch['name'] for ch in config['channels']]
-            selected_channel_name = st.selectbox("Select channel", channel_options)
+            channel_by_name = st.session_state['channel_by_name']
+            selected_channel_name = st.selectbox("Select channel", list(channel_by_name))
             
             # Find selected channel
-            selected_channel = next((ch for ch in config['channels'] if ch['name'] == selected_channel_name), None)
+            selected_channel = channel_by_name.get(selected_channel_name)
             
             if selected_channel:
                 if 'current_stream_key' not in st.session_state:
@@ -1049,7 +1684,7 @@ def main():
                     if st.button("Verify Authentication"):
                         service = create_youtube_service(selected_channel['auth'])
                         if service:
-                            channels = get_channel_info(service)
+                            channels = get_channel_info(service, credentials_key=credentials_fingerprint(selected_channel['auth']))
                             if channels:
                                 channel = channels[0]
                                 st.success(f"✅ Authenticated as: {channel['snippet']['title']}")
@@ -1089,10 +1724,9 @@ def main():
             made_for_kids = st.checkbox("👶 Made for Kids", key="made_for_kids")
         
         with col_basic2:
-            categories = get_youtube_categories()
-            category_names = list(categories.values())
+            category_names = list(CATEGORY_IDS_BY_NAME)
             selected_category_name = st.selectbox("📂 Category", category_names, index=category_names.index("Gaming"))
-            category_id = [k for k, v in categories.items() if v == selected_category_name][0]
+            category_id = CATEGORY_IDS_BY_NAME[selected_category_name]
             st.session_state['category_id'] = category_id
             
             # Stream schedule type
@@ -1121,6 +1755,9 @@ def main():
             with col_tech1:
                 is_shorts = st.checkbox("📱 Shorts Mode (720x1280)")
                 enable_chat = st.checkbox("💬 Enable Live Chat", value=True)
+                pre_encode = st.checkbox("⚡ Pre-encode once, then stream copy", value=False,
+                                         help="Encode the video once into a YouTube-ready file and loop it without re-encoding. "
+                                              "The first start of a new video waits for that encode before going live.")
             
             with col_tech2:
                 bitrate = st.selectbox("📊 Bitrate", ["1500k", "2500k", "4000k", "6000k"], index=1)
@@ -1146,24 +1783,18 @@ def main():
     with col2:
         st.header("📊 Status & Controls")
         
-        # Streaming status
-        streaming = st.session_state.get('streaming', False)
-        if streaming:
-            st.error("🔴 LIVE")
-            
-            # Live stats
-            if 'stream_start_time' in st.session_state:
-                duration = datetime.now() - st.session_state['stream_start_time']
-                st.metric("⏱️ Duration", str(duration).split('.')[0])
-        else:
-            st.success("⚫ OFFLINE")
+        # Filled in after the controls, so a Start/Stop click shows without a second rerun
+        status_slot = st.empty()
         
         # Control buttons
         if st.button("▶️ Start Streaming", type="primary"):
             # Get the current stream key
             stream_key = st.session_state.get('current_stream_key', '')
             
-            if not video_path:
+            running = st.session_state.get('ffmpeg_future')
+            if running is not None and not running.done():
+                st.error("❌ A stream is already running. Stop it before starting another.")
+            elif not video_path:
                 st.error("❌ Please select or upload a video!")
             elif not stream_key:
                 st.error("❌ Stream key is required!")
@@ -1184,36 +1815,60 @@ def main():
                 # Start streaming
                 st.session_state['streaming'] = True
                 st.session_state['stream_start_time'] = datetime.now()
-                st.session_state['live_logs'] = []
+                live_logs = st.session_state['live_logs']
+                live_logs.clear()
                 
                 def log_callback(msg):
-                    if 'live_logs' not in st.session_state:
-                        st.session_state['live_logs'] = []
-                    st.session_state['live_logs'].append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
-                    # Keep only last 100 logs in memory
-                    if len(st.session_state['live_logs']) > 100:
-                        st.session_state['live_logs'] = st.session_state['live_logs'][-100:]
+                    # Bounded deque drops the oldest line; captured directly since
+                    # this runs on the event loop thread, outside the script run
+                    if len(msg) > MAX_LOG_LINE_CHARS:
+                        msg = msg[:MAX_LOG_LINE_CHARS] + "…"
+                    live_logs.append(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
+                
+                # Filled in by the event loop once FFmpeg is spawned
+                ffmpeg_handle = {}
+                st.session_state['ffmpeg_handle'] = ffmpeg_handle
                 
-                st.session_state['ffmpeg_thread'] = threading.Thread(
-                    target=run_ffmpeg, 
-                    args=(video_path, stream_key, is_shorts, log_callback, custom_rtmp or None, st.session_state['session_id']), 
-                    daemon=True
+                # Scheduled on the shared event loop rather than a thread per stream
+                st.session_state['ffmpeg_future'] = asyncio.run_coroutine_threadsafe(
+                    run_ffmpeg(
+                        video_path, stream_key, is_shorts, log_callback, custom_rtmp or None, st.session_state['session_id'],
+                        process_callback=lambda proc: ffmpeg_handle.update(proc=proc),
+                        encoder=detect_hw_encoder(),
+                        normalize=pre_encode
+                    ),
+                    get_event_loop()
                 )
-                st.session_state['ffmpeg_thread'].start()
+                st.session_state['ffmpeg_future'].add_done_callback(log_stream_failure(st.session_state['session_id']))
                 st.success("🚀 Streaming started!")
                 log_to_database(st.session_state['session_id'], "INFO", f"Streaming started: {video_path}")
-                st.rerun()
         
         if st.button("⏹️ Stop Streaming", type="secondary"):
             st.session_state['streaming'] = False
             if 'stream_start_time' in st.session_state:
                 del st.session_state['stream_start_time']
-            os.system("pkill ffmpeg")
-            if os.path.exists("temp_video.mp4"):
-                os.remove("temp_video.mp4")
+            # Cancel first so a stream still hashing or pre-encoding never reaches the RTMP step
+            future = st.session_state.get('ffmpeg_future')
+            if future is not None:
+                future.cancel()
+            stop_ffmpeg(st.session_state.get('ffmpeg_handle', {}).get('proc'))
+            # Unlink the temp file off the UI thread so stopping returns immediately
+            threading.Thread(target=Path("temp_video.mp4").unlink, kwargs={'missing_ok': True}, daemon=True).start()
             st.warning("⏸️ Streaming stopped!")
             log_to_database(st.session_state['session_id'], "INFO", "Streaming stopped by user")
-            st.rerun()
+        
+        # Streaming status
+        streaming = st.session_state.get('streaming', False)
+        with status_slot.container():
+            if streaming:
+                st.error("🔴 LIVE")
+                
+                # Live stats
+                if 'stream_start_time' in st.session_state:
+                    duration = datetime.now() - st.session_state['stream_start_time']
+                    st.metric("⏱️ Duration", str(duration).split('.')[0])
+            else:
+                st.success("⚫ OFFLINE")
         
         # Live broadcast info
         if 'live_broadcast_info' in st.session_state:
@@ -1235,9 +1890,8 @@ def main():
             st.metric("Live Log Entries", len(st.session_state['live_logs']))
         
         # Channel info display
-        if 'channel_config' in st.session_state:
-            config = st.session_state['channel_config']
-            st.metric("Configured Channels", len(config['channels']))
+        if 'channel_count' in st.session_state:
+            st.metric("Configured Channels", st.session_state['channel_count'])
         
         # Quick actions
         st.subheader("⚡ Quick Actions")
@@ -1251,8 +1905,7 @@ def main():
             st.rerun()
     
     # Live Logs Section
-    st.markdown("---")
-    st.header("📝 Live Streaming Logs")
+    st.markdown("---\n## 📝 Live Streaming Logs")
     
     # Log tabs
     tab1, tab2, tab3 = st.tabs(["🔴 Live Logs", "📊 Session History", "🗂️ All Logs"])
@@ -1260,23 +1913,12 @@ def main():
     with tab1:
         st.subheader("Real-time Streaming Logs")
         
-        # Live logs container
-        log_container = st.container()
-        with log_container:
-            if 'live_logs' in st.session_state and st.session_state['live_logs']:
-                # Show last 50 live logs
-                recent_logs = st.session_state['live_logs'][-50:]
-                logs_text = "\n".join(recent_logs)
-                st.text_area("Live Logs", logs_text, height=300, disabled=True, key="live_logs_display")
-            else:
-                st.info("No live logs available. Start streaming to see real-time logs.")
-        
         # Auto-refresh toggle
         auto_refresh = st.checkbox("🔄 Auto-refresh logs", value=streaming)
         
-        if auto_refresh and streaming:
-            time.sleep(2)
-            st.rerun()
+        # Only the log panel reruns on the timer, not the whole script
+        # Idle ticks are cheap: the tail is only rejoined when a new line has arrived
+        st.fragment(run_every=LOG_POLL_INTERVAL if auto_refresh and streaming else None)(render_live_logs)()
     
     with tab2:
         st.subheader("Current Session History")
@@ -1298,6 +1940,15 @@ def main():
                     st.write(f"**{timestamp}** - {message}")
         else:
             st.info("No session logs available yet.")
+        
+        # Past sessions by tag
+        tag_query = st.text_input("🔎 Search past sessions by tag")
+        if tag_query:
+            matches = search_sessions_by_tag(tag_query)
+            for session_id, start_time, stream_title, tags, channel_name in matches:
+                st.write(f"**{start_time}** - {stream_title} ({channel_name}) - {tags}")
+            if not matches:
+                st.info("No sessions found with that tag.")
     
     with tab3:
         st.subheader("All Historical Logs")
@@ -1311,25 +1962,18 @@ def main():
         with col_filter2:
             log_type_filter = st.selectbox("Filter by type", ["All", "INFO", "ERROR", "FFMPEG"])
         
-        all_logs = get_logs_from_database(limit=log_limit)
+        all_logs = get_logs_from_database(limit=log_limit, log_type=None if log_type_filter == "All" else log_type_filter)
         
         if all_logs:
-            # Filter by type if selected
-            if log_type_filter != "All":
-                all_logs = [log for log in all_logs if log[1] == log_type_filter]
-            
-            # Display in expandable sections
-            for i, log in enumerate(all_logs[:50]):  # Limit display to 50 for performance
-                timestamp, log_type, message, video_file, channel_name = log
-                
-                with st.expander(f"{log_type} - {timestamp} - {message[:50]}..."):
-                    st.write(f"**Timestamp:** {timestamp}")
-                    st.write(f"**Type:** {log_type}")
-                    st.write(f"**Message:** {message}")
-                    if video_file:
-                        st.write(f"**Video File:** {video_file}")
-                    if channel_name:
-                        st.write(f"**Channel:** {channel_name}")
+            # One virtualized table instead of an expander per row
+            st.dataframe(
+                [
+                    {"Timestamp": timestamp, "Type": log_type, "Message": message, "Video File": video_file, "Channel": channel_name}
+                    for timestamp, log_type, message, video_file, channel_name in all_logs
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
         else:
             st.info("No historical logs available.")
 